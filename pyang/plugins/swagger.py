@@ -15,18 +15,44 @@
 """
 
 import optparse
+import hashlib
 import json
+import multiprocessing
+import os
+import pickle
+import random
 import re
 import string
-from collections import OrderedDict
-
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from io import StringIO
+    from socketserver import ThreadingMixIn, UnixStreamServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn, UnixStreamServer
+    from StringIO import StringIO
+
+import pyang
+from pyang import Context
 from pyang import plugin
 from pyang import statements
 from pyang import error
 from pyang import types
+from pyang import util
+from pyang import yang_parser
+from pyang import yin_parser
 
 TYPEDEFS = dict()
 PARENT_MODELS = dict()
+# Range of the numeric identifiers assigned to the schema nodes for the binary encodings.
+SID_BASE = 60000
+SID_RANGE = 2 ** 24
 
 
 def pyang_plugin_init():
@@ -65,7 +91,148 @@ class SwaggerPlugin(plugin.PyangPlugin):
                 '--swagger-path',
                 dest='swagger_path',
                 type='string',
-                help='Path to print')]
+                help='Path to print'),
+            optparse.make_option(
+                '--swagger-payload-dir',
+                dest='swagger_payload_dir',
+                type='string',
+                help='Directory where a synthetic request body corpus is written, '
+                     'one JSON-lines file per post/put operation'),
+            optparse.make_option(
+                '--swagger-payload-count',
+                dest='swagger_payload_count',
+                type='int',
+                default=1000,
+                help='Number of request bodies generated per operation'),
+            optparse.make_option(
+                '--swagger-payload-seed',
+                dest='swagger_payload_seed',
+                type='int',
+                default=0,
+                help='Seed used to make the request body corpus reproducible'),
+            optparse.make_option(
+                '--swagger-payload-list-size',
+                dest='swagger_payload_list_size',
+                type='int',
+                default=3,
+                help='Maximum number of entries generated for each list'),
+            optparse.make_option(
+                '--swagger-payload-depth',
+                dest='swagger_payload_depth',
+                type='int',
+                default=8,
+                help='Maximum nesting of containers and lists in generated bodies'),
+            optparse.make_option(
+                '--swagger-validators',
+                dest='swagger_validators',
+                type='string',
+                help='Python file where precompiled request body validators are written'),
+            optparse.make_option(
+                '--swagger-pagination',
+                dest='swagger_pagination',
+                type='choice',
+                choices=['offset', 'cursor'],
+                help='Add a paginated collection endpoint to every list, using offset/limit '
+                     'or cursor based paging'),
+            optparse.make_option(
+                '--swagger-yang-patch',
+                dest='swagger_yang_patch',
+                action='store_true',
+                default=False,
+                help='Add a YANG Patch operation to containers and list collections'),
+            optparse.make_option(
+                '--swagger-conditional',
+                dest='swagger_conditional',
+                action='store_true',
+                default=False,
+                help='Add ETag/Last-Modified validators and conditional request headers to '
+                     'read, update and delete operations'),
+            optparse.make_option(
+                '--swagger-cbor',
+                dest='swagger_cbor',
+                action='store_true',
+                default=False,
+                help='Advertise the application/yang-data+cbor media type and add a numeric '
+                     'identifier (x-sid) to every schema node'),
+            optparse.make_option(
+                '--swagger-sse',
+                dest='swagger_sse',
+                action='store_true',
+                default=False,
+                help='Add a Server-Sent Events variant of every notification stream'),
+            optparse.make_option(
+                '--swagger-diff-from',
+                dest='swagger_diff_from',
+                type='string',
+                help='Previously emitted specification to compare the current one with'),
+            optparse.make_option(
+                '--swagger-diff-output',
+                dest='swagger_diff_output',
+                type='string',
+                help='File where the differences with the previous specification are written'),
+            optparse.make_option(
+                '--swagger-diff-format',
+                dest='swagger_diff_format',
+                type='choice',
+                choices=['jsonpatch', 'operations'],
+                default='operations',
+                help='Write the differences as a JSON Patch or as a list of changed '
+                     'paths, operations and definitions'),
+            optparse.make_option(
+                '--swagger-size-report',
+                dest='swagger_size_report',
+                type='string',
+                help='File where the size attribution report of the specification is written'),
+            optparse.make_option(
+                '--swagger-size-report-top',
+                dest='swagger_size_report_top',
+                type='int',
+                default=10,
+                help='Number of heaviest YANG subtrees listed in the size report'),
+            optparse.make_option(
+                '--swagger-serve',
+                dest='swagger_serve',
+                type='string',
+                help='Run a generation service on host:port or unix:<socket path>, keeping the '
+                     'modules of the search path parsed and validated'),
+            optparse.make_option(
+                '--swagger-serve-workers',
+                dest='swagger_serve_workers',
+                type='int',
+                default=4,
+                help='Number of worker processes of the generation service'),
+            optparse.make_option(
+                '--swagger-serve-cache-size',
+                dest='swagger_serve_cache_size',
+                type='int',
+                default=128,
+                help='Number of generated specifications cached by the generation service'),
+            optparse.make_option(
+                '--swagger-serve-timeout',
+                dest='swagger_serve_timeout',
+                type='float',
+                default=60,
+                help='Seconds after which a request of the generation service fails, e.g. when '
+                     'its worker process has died'),
+            optparse.make_option(
+                '--swagger-snapshot',
+                dest='swagger_snapshot',
+                type='string',
+                help='Cache file of the parsed and validated modules of the search path, '
+                     'created or refreshed when its modules change'),
+            optparse.make_option(
+                '--swagger-format',
+                dest='swagger_format',
+                type='choice',
+                choices=list(RENDERERS),
+                default='swagger2',
+                help='Format of the generated API description'),
+            optparse.make_option(
+                '--swagger-ir',
+                dest='swagger_ir',
+                type='string',
+                help='Cache file of the API intermediate representation, reused while the '
+                     'modules and the options do not change')]
         optgrp = optparser.add_option_group('Swagger specific options')
         optgrp.add_options(optlist)
 
@@ -75,11 +242,37 @@ class SwaggerPlugin(plugin.PyangPlugin):
     def setup_fmt(self, ctx):
         ctx.implicit_errors = False
 
+    def pre_load_modules(self, ctx):
+        self.snapshot_modules = None
+        if ctx.opts.swagger_snapshot:
+            self.snapshot_modules = load_snapshot(ctx)
+
     def pre_validate(self, ctx, modules):
+        # The snapshot is taken before the modules are modified by the plugin, and only
+        # refreshed when new modules of the search path have been loaded.
+        if ctx.opts.swagger_snapshot:
+            loaded = set(key for key, module in ctx.modules.items()
+                         if module is not None and module not in modules)
+            if loaded != self.snapshot_modules:
+                save_snapshot(ctx, modules)
         for module in modules:
             add_fake_list_at_beginning(module)
 
     def emit(self, ctx, modules, fd):
+        # The specification is already written to the output, so the differences need their own file.
+        if ctx.opts.swagger_diff_from and not ctx.opts.swagger_diff_output:
+            raise error.EmitError('--swagger-diff-from requires --swagger-diff-output')
+        # The previous file holds a single specification, which is compared with a single module.
+        if ctx.opts.swagger_diff_from and len(modules) > 1:
+            raise error.EmitError('--swagger-diff-from requires a single module')
+        # The size report and the summary of the changes need the paths and the schemas of the API.
+        if ctx.opts.swagger_format not in SPEC_FORMATS:
+            if ctx.opts.swagger_size_report:
+                raise error.EmitError('--swagger-size-report requires the {0} format'.format(
+                    ' or '.join(SPEC_FORMATS)))
+            if ctx.opts.swagger_diff_from and ctx.opts.swagger_diff_format == 'operations':
+                raise error.EmitError('--swagger-diff-format operations requires the {0} format'.format(
+                    ' or '.join(SPEC_FORMATS)))
         # TODO: the path variable is currently not used.
         if ctx.opts.swagger_path is not None:
             path = string.split(ctx.opts.swagger_path, '/')
@@ -89,7 +282,20 @@ class SwaggerPlugin(plugin.PyangPlugin):
             path = None
         global S_API
         S_API = ctx.opts.s_api
-        emit_swagger_spec(ctx, modules, fd, ctx.opts.path)
+        global PAGINATION
+        PAGINATION = ctx.opts.swagger_pagination
+        global YANG_PATCH
+        YANG_PATCH = ctx.opts.swagger_yang_patch
+        global CONDITIONAL
+        CONDITIONAL = ctx.opts.swagger_conditional
+        global CBOR
+        CBOR = ctx.opts.swagger_cbor
+        global SSE
+        SSE = ctx.opts.swagger_sse
+        if ctx.opts.swagger_serve:
+            serve_swagger(ctx, modules)
+        else:
+            emit_swagger_spec(ctx, modules, fd, ctx.opts.path)
 
 
 def add_fake_list_at_beginning(module):
@@ -226,11 +432,54 @@ def print_header(module, fd, children):
 
 def emit_swagger_spec(ctx, modules, fd, path):
     """ Emits the complete swagger specification for the yang file."""
+    irs = None
+    if ctx.opts.swagger_ir:
+        irs = load_ir_cache(ctx)
+    if irs is None:
+        irs = gen_api_irs(ctx, modules, path)
+        if ctx.opts.swagger_ir:
+            save_ir_cache(ctx, irs)
+
+    specs = list()
+    definitions = OrderedDict()
+    for module, ir in zip(modules, irs):
+        spec = RENDERERS[ctx.opts.swagger_format](ir)
+        fd.write(json.dumps(spec, indent=4, separators=(',', ': ')))
+
+        # The payloads and the validators are based on the swagger specification.
+        if ctx.opts.swagger_payload_dir or ctx.opts.swagger_validators:
+            model = render_swagger2(ir)
+
+            if ctx.opts.swagger_payload_dir:
+                emit_payload_corpus(ctx.opts, model)
+
+            definitions.update(model['definitions'])
+
+        # The differences and the size report are about the emitted document.
+        if ctx.opts.swagger_diff_from:
+            emit_spec_diff(ctx.opts, spec)
+        specs.append(spec)
+
+    # The validators of all the modules are written in a single python module.
+    if ctx.opts.swagger_validators:
+        emit_validators(ctx.opts, modules, definitions)
+
+    if ctx.opts.swagger_size_report:
+        emit_size_report(ctx.opts, modules, specs)
 
+
+def gen_api_irs(ctx, modules, path):
+    """ Traverses the yang modules, returning the API intermediate representation of each of them."""
+    irs = list()
     printed_header = False
     model = OrderedDict()
     definitions = OrderedDict()
 
+    # The identifiers are assigned before generating anything, since the API generation
+    # renames the duplicated list keys of the schema tree.
+    if CBOR:
+        assign_schema_identifiers(ctx, modules)
+
     # Go through all modules and extend the model.
     for module in modules:
         # extract children which contain data definition keywords
@@ -238,7 +487,7 @@ def emit_swagger_spec(ctx, modules, fd, path):
                if ch.keyword in (statements.data_definition_keywords + ['rpc', 'notification'])]
 
         if not printed_header:
-            model = print_header(module, fd, chs)
+            model = print_header(module, None, chs)
             printed_header = True
             path = '/'
 
@@ -279,7 +528,9 @@ def emit_swagger_spec(ctx, modules, fd, path):
             gen_apis(chs, path, model['paths'], definitions, is_root=True)
 
         model['definitions'] = definitions
-        fd.write(json.dumps(model, indent=4, separators=(',', ': ')))
+        irs.append(build_api_ir(module, model))
+
+    return irs
 
 
 def find_models(ctx, module, children, referenced_models):
@@ -436,6 +687,8 @@ def gen_model(children, tree_structure, config=True):
         if child.keyword == 'leaf-list':
             ll_node = {'type': 'array', 'items': node}
             node = ll_node
+        if CBOR and hasattr(child, 'i_swagger_sid'):
+            node['x-sid'] = child.i_swagger_sid
         # Groupings are class names and upper camelcase.
         # All the others are variables and lower camelcase.
         if child.keyword == 'grouping':
@@ -476,6 +729,53 @@ def gen_model(children, tree_structure, config=True):
             tree_structure[to_lower_camelcase(child.arg)] = node
 
 
+def assign_schema_identifiers(ctx, modules):
+    """ Assigns a numeric identifier to every schema node of each module, as needed by the
+    binary encodings (e.g. YANG-CBOR). The nodes of a module are its data tree and the groupings
+    it turns into definitions, imported ones included.
+    The identifier of a node is the hash of its module qualified schema path within
+    [SID_BASE, SID_BASE + SID_RANGE), so it does not change when other nodes or modules are added.
+    A colliding path takes the next free identifier, in the order of the paths of the module.
+    """
+    for module in modules:
+        nodes = list()
+        collect_schema_nodes(module.i_children, str(module.arg) + ':', nodes)
+
+        groupings = list(module.i_groupings.values())
+        chs = [ch for ch in module.i_children
+               if ch.keyword in (statements.data_definition_keywords + ['rpc', 'notification'])]
+        referenced_models = find_models(ctx, module, groupings, list())
+        referenced_models.extend(find_models(ctx, module, chs, referenced_models))
+        for grouping in groupings + referenced_models:
+            grouping_module = getattr(grouping, 'i_module', None) or grouping.top
+            collect_schema_nodes(grouping.i_children, '{0}:grouping:{1}'.format(grouping_module.arg, grouping.arg),
+                                 nodes)
+
+        # The nodes of the groupings shared with a previous module keep their identifier.
+        used = set(stmt.i_swagger_sid for path, stmt in nodes if hasattr(stmt, 'i_swagger_sid'))
+        for path, stmt in sorted(nodes, key=lambda element: element[0]):
+            if hasattr(stmt, 'i_swagger_sid'):
+                continue
+            offset = int(hashlib.sha256(path.encode('utf-8')).hexdigest(), 16) % SID_RANGE
+            while SID_BASE + offset in used:
+                offset = (offset + 1) % SID_RANGE
+            stmt.i_swagger_sid = SID_BASE + offset
+            used.add(stmt.i_swagger_sid)
+
+
+def collect_schema_nodes(children, path, nodes):
+    """ Collects the (schema path, statement) pairs of the subtree."""
+    for child in children:
+        if child.keyword not in (statements.data_definition_keywords +
+                                 ['case', 'rpc', 'input', 'output', 'notification']):
+            continue
+        child_path = path + '/' + child.arg if child.keyword not in ('input', 'output') \
+            else path + '/' + child.keyword
+        nodes.append((child_path, child))
+        if hasattr(child, 'i_children'):
+            collect_schema_nodes(child.i_children, child_path, nodes)
+
+
 def gen_model_node(node, tree_structure, config=True):
     """ Generates the properties sub-tree of the current node."""
     if hasattr(node, 'i_children'):
@@ -536,6 +836,7 @@ def gen_api_node(node, path, apis, definitions, config=True):
             # is replaced by:
             #
             #          /config/Context/{uuid}/_topology/{topology_uuid}/_link/{link_uuid}/_transferCost/costCharacteristic/{costAlgorithm}/
+            collection_path = path
             for key in keyList:
                 if key:
                     match = re.search(r"\{([A-Za-z0-9_]+)\}", path)
@@ -604,7 +905,21 @@ def gen_api_node(node, path, apis, definitions, config=True):
             new_schema = schema
         else:
             new_schema = {"$ref": schema['$ref']}
+        # The collection endpoint of a list precedes the endpoint of its single items.
+        if node.keyword == 'list' and collection_path != path:
+            collection = print_list_collection(node, config, new_schema, collection_path, keyList, definitions)
+            if collection:
+                apis[str(collection_path)] = collection
         apis[str(path)] = print_api(node, config, new_schema, path)
+        # A list without keys has no single items, so its only endpoint is the collection.
+        if node.keyword == 'list' and collection_path == path:
+            if config and config != 'false' and YANG_PATCH:
+                apis[str(path)]['patch'] = generate_patch(node, gen_patch_model(node, new_schema, definitions),
+                                                          path, True)
+            if PAGINATION:
+                add_paging(apis[str(path)]['get'], gen_page_model(node, new_schema, keyList, definitions))
+        if node.keyword == 'container' and config and YANG_PATCH:
+            apis[str(path)]['patch'] = generate_patch(node, gen_patch_model(node, new_schema, definitions), path)
 
     elif node.keyword == 'rpc':
         schema_out = dict()
@@ -643,15 +958,27 @@ def gen_api_node(node, path, apis, definitions, config=True):
                 else:
                     schema_out = None
 
-        apis['/operations' + str(path)] = print_rpc(node, schema, schema_out)
+        apis['/operations' + str(path)] = print_rpc(node, schema, schema_out, '/operations' + str(path))
         return apis
 
     elif node.keyword == 'notification':
         schema_out = dict()
         gen_model([node], schema_out)
-        # For the API generation we pass only the content of the schema i.e {"child.arg":schema} -> schema
-        schema_out = schema_out[to_lower_camelcase(node.arg)]
-        apis['/streams' + str(path)] = print_notification(node, schema_out)
+        # The content of the notification is defined as a new schema, named the node name and the
+        # extension NotificationSchema (i.e., NodenameNotificationSchema), and every event wraps it
+        # in the RESTCONF notification envelope (i.e., NodenameNotificationEvent).
+        definitions[to_upper_camelcase(node.arg + 'Notification_schema')] = schema_out[to_lower_camelcase(node.arg)]
+        event = OrderedDict()
+        event['eventTime'] = {'type': 'string', 'format': 'date-time'}
+        event[_MODULE_NAME + ':' + str(node.arg)] = {
+            '$ref': '#/definitions/' + to_upper_camelcase(node.arg + 'Notification_schema')}
+        definitions[to_upper_camelcase(node.arg + 'Notification_event')] = {
+            'properties': {'ietf-restconf:notification': {'properties': event}}}
+        schema_out = {'$ref': '#/definitions/' + to_upper_camelcase(node.arg + 'Notification_event')}
+
+        apis['/streams' + str(path)] = print_notification(node, schema_out, '/streams' + str(path), ['ws'])
+        if SSE:
+            apis['/streams/sse' + str(path)] = print_notification(node, schema_out, '/streams/sse' + str(path))
         return apis
 
     # Generate APIs for children.
@@ -679,14 +1006,21 @@ def gen_typedefs(typedefs):
         TYPEDEFS[typedef.arg] = type
 
 
-def print_notification(node, schema_out):
-    operations = {'get': generate_retrieve(node, schema_out, None)}
-    operations['get']['schemes'] = ['ws']
+def print_notification(node, schema_out, path, schemes=None):
+    """ Creates the subscription operation of a notification stream.
+    Without schemes the stream is delivered as Server-Sent Events over the default scheme.
+    """
+    operations = {'get': generate_retrieve(node, schema_out, path)}
+    operations['get']['parameters'].extend(create_stream_parameters(schemes))
+    if schemes:
+        operations['get']['schemes'] = schemes
+    else:
+        operations['get']['produces'] = ['text/event-stream']
     return operations
 
 
-def print_rpc(node, schema_in, schema_out):
-    operations = {'post': generate_create(node, schema_in, None, schema_out)}
+def print_rpc(node, schema_in, schema_out, path):
+    operations = {'post': generate_create(node, schema_in, path, schema_out)}
     return operations
 
 
@@ -709,6 +1043,78 @@ def print_api(node, config, ref, path):
     return operations
 
 
+def print_list_collection(node, config, ref, path, keys, definitions):
+    """ Creates the operations of a list collection, i.e. the paginated read and the YANG Patch.
+    Every page is returned inside an envelope, named the list name and the extension Page
+    (i.e., NodenamePage), which carries the continuation token of the next page.
+    """
+    operations = {}
+    if config and config != 'false' and YANG_PATCH:
+        operations['patch'] = generate_patch(node, gen_patch_model(node, ref, definitions), path, True)
+    if PAGINATION:
+        operations['get'] = generate_retrieve_page(node, gen_page_model(node, ref, keys, definitions), path)
+    return operations
+
+
+def gen_page_model(node, ref, keys, definitions):
+    """ Generates the page envelope of a list collection, named the list name and the
+    extension Page (i.e., NodenamePage).
+    """
+    page = OrderedDict()
+    page['items'] = {'type': 'array', 'items': ref}
+    if keys:
+        page['items']['x-key'] = [to_lower_camelcase(key) for key in keys]
+    if PAGINATION == 'cursor':
+        page['nextCursor'] = {'type': 'string',
+                              'description': 'Cursor of the next page, missing on the last page'}
+    else:
+        page['offset'] = {'type': 'integer', 'format': 'uint32', 'description': 'Offset of the first entry'}
+        page['total'] = {'type': 'integer', 'format': 'uint32', 'description': 'Number of entries of the list'}
+        page['nextOffset'] = {'type': 'integer', 'format': 'uint32',
+                              'description': 'Offset of the next page, missing on the last page'}
+    definitions[to_upper_camelcase(node.arg + '_page')] = {'properties': page}
+    return {'$ref': '#/definitions/' + to_upper_camelcase(node.arg + '_page')}
+
+
+def gen_patch_model(node, ref, definitions):
+    """ Generates the YANG Patch (RFC 8072) body of a container or list collection.
+    The new definition is named the node name and the extension Patch (i.e., NodenamePatch) and
+    holds an ordered array of edits, whose value references the existing schema of the node.
+    """
+    edit = OrderedDict()
+    edit['edit-id'] = {'type': 'string', 'description': 'Identifier of the edit within the patch'}
+    edit['operation'] = {'type': 'string',
+                         'enum': ['create', 'delete', 'insert', 'merge', 'move', 'replace', 'remove']}
+    edit['target'] = {'type': 'string',
+                      'description': 'Path of the target resource, relative to the patched resource'}
+    edit['point'] = {'type': 'string', 'description': 'Path of the reference entry of insert and move'}
+    edit['where'] = {'type': 'string', 'enum': ['before', 'after', 'first', 'last'], 'default': 'last'}
+    edit['value'] = ref
+
+    patch = OrderedDict()
+    patch['patch-id'] = {'type': 'string', 'description': 'Identifier of the patch'}
+    patch['comment'] = {'type': 'string'}
+    patch['edit'] = {'type': 'array', 'description': 'Edits applied in order, as a single transaction',
+                     'items': {'properties': edit}, 'x-key': ['edit-id']}
+    definitions[to_upper_camelcase(node.arg + '_patch')] = {'properties': {'ietf-yang-patch:yang-patch': {
+        'properties': patch}}}
+
+    if 'YangPatchStatus' not in definitions:
+        edit_status = OrderedDict()
+        edit_status['edit-id'] = {'type': 'string'}
+        edit_status['ok'] = {'type': 'boolean'}
+        edit_status['errors'] = {'type': 'array', 'items': {'type': 'string'}}
+        status = OrderedDict()
+        status['patch-id'] = {'type': 'string'}
+        status['ok'] = {'type': 'boolean'}
+        status['edit-status'] = {'properties': {'edit': {'type': 'array', 'items': {'properties': edit_status},
+                                                         'x-key': ['edit-id']}}}
+        definitions['YangPatchStatus'] = {'properties': {'ietf-yang-patch:yang-patch-status': {
+            'properties': status}}}
+
+    return {'$ref': '#/definitions/' + to_upper_camelcase(node.arg + '_patch')}
+
+
 def get_input_path_parameters(path):
     """"Get the input parameters from the path url."""
     path_params = []
@@ -766,12 +1172,65 @@ def generate_retrieve(stmt, schema, path):
     if path:
         get['parameters'] = create_parameter_list(path_params)
 
+    # RESTCONF query parameters for partial retrieval (RFC 8040, section 4.8) only make sense
+    # on data nodes having a subtree. The response schema stays the same, since all the
+    # properties are optional and a partial tree is still a valid instance of it.
+    if path and stmt.keyword in ('container', 'list'):
+        query_params = create_retrieve_query_parameters()
+        get['parameters'].extend(query_params)
+        get['x-cliParam']['queryParams'] = [{'name': param['name'], 'description': param['description']}
+                                            for param in query_params]
+
     # Responses
     response = create_responses(stmt.arg, schema)
     get['responses'] = response
+    if CONDITIONAL and path and stmt.keyword != 'notification':
+        add_conditional_headers(get, 'Read')
+    return get
+
+
+# RETRIEVE PAGE
+
+def generate_retrieve_page(stmt, schema, path):
+    """ Generates the paginated retrieve function definitions of a list collection."""
+    path_params = get_input_path_parameters(path)
+    get = {}
+    generate_api_header(stmt, get, 'Read', path, True)
+    # Input parameters
+    get['parameters'] = create_parameter_list(path_params)
+    get['parameters'].extend(create_retrieve_query_parameters())
+
+    # The read command of the single items already uses the list name, so the collection gets its own.
+    get['x-cliParam']['commandName'] = get['x-cliParam']['commandName'][:-len('Cmd')] + 'ListCmd'
+    get['x-cliParam']['commandUse'] = str(stmt.arg).lower() + '-list'
+
+    # Responses
+    response = create_responses(stmt.arg)
+    get['responses'] = response
+    add_paging(get, schema)
+    if CONDITIONAL:
+        add_conditional_headers(get, 'Read')
     return get
 
 
+def add_paging(get, schema):
+    """ Turns a retrieve operation into a paginated one, returning the page envelope "schema".
+    The paging parameters follow the path parameters.
+    """
+    paging_params = create_paging_parameters()
+    position = len([param for param in get['parameters'] if param['in'] == 'path'])
+    get['parameters'][position:position] = paging_params
+
+    # This extension lets the CLI generator follow the continuation token of the pages
+    get['x-cliParam']['pagination'] = OrderedDict()
+    get['x-cliParam']['pagination']['mode'] = PAGINATION
+    get['x-cliParam']['pagination']['operationId'] = get['operationId']
+    get['x-cliParam']['pagination']['params'] = [param['name'] for param in paging_params]
+    get['x-cliParam']['pagination']['nextToken'] = 'nextCursor' if PAGINATION == 'cursor' else 'nextOffset'
+
+    get['responses']['200']['schema'] = schema
+
+
 # UPDATE
 
 def generate_update(stmt, schema, path):
@@ -796,6 +1255,8 @@ def generate_update(stmt, schema, path):
     response = create_responses(stmt.arg)
 
     put['responses'] = response
+    if CONDITIONAL:
+        add_conditional_headers(put, 'Update')
     return put
 
 
@@ -813,9 +1274,28 @@ def generate_delete(stmt, ref, path):
     # Responses
     response = create_responses(stmt.arg)
     delete['responses'] = response
+    if CONDITIONAL:
+        add_conditional_headers(delete, 'Delete')
     return delete
 
 
+# PATCH
+
+def generate_patch(stmt, schema, path, is_collection=False):
+    """ Generates the YANG Patch function definitions."""
+    path_params = get_input_path_parameters(path)
+    patch = {}
+    generate_api_header(stmt, patch, 'Patch', path, is_collection)
+    patch['consumes'] = ['application/yang-patch+json']
+    # Input parameters
+    patch['parameters'] = create_parameter_list(path_params)
+    patch['parameters'].append(create_body_dict(stmt.arg, schema))
+    # Responses
+    response = create_responses(stmt.arg, {'$ref': '#/definitions/YangPatchStatus'})
+    patch['responses'] = response
+    return patch
+
+
 def create_parameter_list(path_params):
     """ Create description from a list of path parameters."""
     param_list = []
@@ -830,6 +1310,125 @@ def create_parameter_list(path_params):
     return param_list
 
 
+def create_paging_parameters():
+    """ Create the query parameters selecting a page of a list collection."""
+    if PAGINATION == 'cursor':
+        start = OrderedDict()
+        start['in'] = 'query'
+        start['name'] = 'cursor'
+        start['description'] = 'Cursor returned as nextCursor by the previous page'
+        start['required'] = False
+        start['type'] = 'string'
+    else:
+        start = OrderedDict()
+        start['in'] = 'query'
+        start['name'] = 'offset'
+        start['description'] = 'Offset of the first entry to return'
+        start['required'] = False
+        start['type'] = 'integer'
+        start['format'] = 'uint32'
+        start['default'] = 0
+
+    limit = OrderedDict()
+    limit['in'] = 'query'
+    limit['name'] = 'limit'
+    limit['description'] = 'Maximum number of entries to return'
+    limit['required'] = False
+    limit['type'] = 'integer'
+    limit['format'] = 'uint32'
+    limit['minimum'] = 1
+
+    return [start, limit]
+
+
+def add_conditional_headers(struct, operation):
+    """ Add the HTTP conditional request support (RFC 7232) to an operation.
+    Successful responses carry the ETag and Last-Modified validators of the resource; reads
+    can be answered with 304 if they did not change, while updates and deletes fail with 412
+    if the resource has been modified in the meantime.
+    """
+    struct['responses']['200']['headers'] = {
+        'ETag': {'type': 'string', 'description': 'Entity tag of the resource'},
+        'Last-Modified': {'type': 'string', 'description': 'Last modification time of the resource'}
+    }
+    if operation == 'Read':
+        headers = [('If-None-Match', 'Return the resource only if its entity tag does not match'),
+                   ('If-Modified-Since', 'Return the resource only if modified after this time')]
+        struct['responses']['304'] = {'description': 'Not modified'}
+    else:
+        headers = [('If-Match', 'Apply the operation only if the entity tag of the resource matches'),
+                   ('If-Unmodified-Since', 'Apply the operation only if not modified after this time')]
+        struct['responses']['412'] = {'description': 'Precondition failed'}
+
+    struct.setdefault('parameters', list())
+    for name, description in headers:
+        parameter = dict()
+        parameter['in'] = 'header'
+        parameter['name'] = name
+        parameter['description'] = description
+        parameter['required'] = False
+        parameter['type'] = 'string'
+        struct['parameters'].append(parameter)
+
+
+def create_stream_parameters(schemes=None):
+    """ Create the filter, replay and resume parameters of a notification stream (RFC 8040, section 6.3).
+    Server-Sent Events clients resume through the Last-Event-ID header, while websocket
+    clients, which cannot set it, use a query parameter.
+    """
+    param_list = []
+    for name, description, format in [
+            ('filter', 'XPath expression selecting the events to deliver', None),
+            ('fields', 'Subset of the event content to deliver, e.g. a;b/c', None),
+            ('start-time', 'Replay the events generated since this time', 'date-time'),
+            ('stop-time', 'Stop the subscription at this time', 'date-time'),
+            ('last-event-id', 'Resume the subscription after this event', None)]:
+        parameter = OrderedDict()
+        parameter['in'] = 'query'
+        parameter['name'] = name
+        parameter['description'] = description
+        parameter['required'] = False
+        parameter['type'] = 'string'
+        if format:
+            parameter['format'] = format
+        param_list.append(parameter)
+
+    if not schemes:
+        param_list[-1]['in'] = 'header'
+        param_list[-1]['name'] = 'Last-Event-ID'
+    return param_list
+
+
+def create_retrieve_query_parameters():
+    """ Create the RESTCONF depth, fields and content query parameters of a retrieve operation."""
+    depth = OrderedDict()
+    depth['in'] = 'query'
+    depth['name'] = 'depth'
+    depth['description'] = 'Number of subtree levels to return, from 1 to 65535, or unbounded'
+    depth['required'] = False
+    depth['type'] = 'string'
+    depth['pattern'] = '^(unbounded|[1-9][0-9]{0,3}|[1-5][0-9]{4}|6[0-4][0-9]{3}|65[0-4][0-9]{2}|655[0-2][0-9]|6553[0-5])$'
+    depth['default'] = 'unbounded'
+
+    fields = OrderedDict()
+    fields['in'] = 'query'
+    fields['name'] = 'fields'
+    fields['description'] = 'Subset of the subtree to return, e.g. a;b/c(d;e)'
+    fields['required'] = False
+    fields['type'] = 'string'
+
+    content = OrderedDict()
+    content['in'] = 'query'
+    content['name'] = 'content'
+    content['description'] = 'Return only configuration data, only non-configuration data or both'
+    content['required'] = False
+    content['type'] = 'string'
+    content['enum'] = ['config', 'nonconfig', 'all']
+    content['default'] = 'all'
+
+    return [depth, fields, content]
+
+
 def create_body_dict(name, schema):
     """ Create a body description from the name and the schema."""
     body_dict = {}
@@ -885,6 +1484,9 @@ def generate_api_header(stmt, struct, operation, path, is_collection=False):
                                           ('' if is_collection else 'ByID'))
     struct['produces'] = ['application/json']
     struct['consumes'] = ['application/json']
+    if CBOR:
+        struct['produces'].append('application/yang-data+cbor')
+        struct['consumes'].append('application/yang-data+cbor')
 
     # This is a vendor extension added to support the automatic CLI generation
     struct['x-cliParam'] = dict()
@@ -950,6 +1552,1321 @@ def generate_api_header(stmt, struct, operation, path, is_collection=False):
         struct['tags'] = [_ROOT_NODE_NAME]
 
 
+###########################################################
+############# Synthetic Payload Generation ################
+###########################################################
+
+# Value ranges of the integer formats produced by gen_model.
+INTEGER_RANGES = {
+    'int8': (-2 ** 7, 2 ** 7 - 1),
+    'int16': (-2 ** 15, 2 ** 15 - 1),
+    'int32': (-2 ** 31, 2 ** 31 - 1),
+    'int64': (-2 ** 63, 2 ** 63 - 1),
+    'uint8': (0, 2 ** 8 - 1),
+    'uint16': (0, 2 ** 16 - 1),
+    'uint32': (0, 2 ** 32 - 1),
+    'uint64': (0, 2 ** 64 - 1)
+}
+
+_PAYLOAD_CHARS = string.ascii_letters + string.digits
+
+
+def emit_payload_corpus(opts, model):
+    """ Writes a reproducible corpus of request bodies for every post/put operation of the spec.
+    Each operation gets its own JSON-lines file, named after its operationId.
+    """
+    if not os.path.isdir(opts.swagger_payload_dir):
+        os.makedirs(opts.swagger_payload_dir)
+
+    factories = dict()
+    for path in model.get('paths', {}):
+        for method in ('post', 'put'):
+            operation = model['paths'][path].get(method)
+            if not operation:
+                continue
+            body = [param for param in operation.get('parameters', []) if param['in'] == 'body']
+            if not body:
+                continue
+
+            factory = compile_payload_factory(body[0]['schema'], model['definitions'], factories,
+                                              opts.swagger_payload_list_size, opts.swagger_payload_depth)
+            # The seed of each operation only depends on the global seed and on the operationId,
+            # so the corpus of an operation does not change when other operations are added.
+            rng = random.Random(opts.swagger_payload_seed ^ zlib.crc32(operation['operationId'].encode('utf-8')))
+            file_name = os.path.join(opts.swagger_payload_dir, operation['operationId'] + '.jsonl')
+            with open(file_name, 'w') as out:
+                for _ in range(opts.swagger_payload_count):
+                    out.write(json.dumps(factory(rng, 0, 0), separators=(',', ':')))
+                    out.write('\n')
+
+
+def compile_payload_factory(schema, definitions, factories, list_size, max_depth):
+    """ Compiles a schema into a function returning random instances of it.
+    The function signature is factory(rng, depth, index), where index is the position of the
+    instance inside its enclosing list and is used to keep the list keys unique.
+    Referenced definitions are compiled once and shared through the "factories" cache.
+    """
+    if '$ref' in schema:
+        name = schema['$ref'].split('/')[-1]
+        if name not in factories:
+            # A placeholder makes recursive definitions resolvable while they are compiled.
+            factories[name] = None
+            factories[name] = compile_payload_factory(definitions[name], definitions, factories,
+                                                      list_size, max_depth)
+        return lambda rng, depth, index: factories[name](rng, depth, index)
+
+    if 'allOf' in schema:
+        parts = [compile_payload_factory(part, definitions, factories, list_size, max_depth)
+                 for part in schema['allOf']]
+
+        def all_of_factory(rng, depth, index):
+            value = dict()
+            for part in parts:
+                value.update(part(rng, depth, index))
+            return value
+        return all_of_factory
+
+    if schema.get('type') == 'array':
+        return compile_array_factory(schema, definitions, factories, list_size, max_depth)
+
+    if 'properties' in schema:
+        return compile_object_factory(schema, definitions, factories, list_size, max_depth)
+
+    return compile_leaf_factory(schema)
+
+
+def compile_object_factory(schema, definitions, factories, list_size, max_depth):
+    """ Compiles the factory of a container, i.e. a schema with properties."""
+    leaves = list()
+    subtrees = list()
+    for name, prop in schema['properties'].items():
+        factory = compile_payload_factory(prop, definitions, factories, list_size, max_depth)
+        if is_leaf_schema(prop):
+            leaves.append((name, factory))
+        else:
+            subtrees.append((name, factory))
+
+    def object_factory(rng, depth, index):
+        value = dict()
+        for name, factory in leaves:
+            value[name] = factory(rng, depth + 1, index)
+        # Containers and lists beyond the maximum depth are omitted.
+        if depth < max_depth:
+            for name, factory in subtrees:
+                value[name] = factory(rng, depth + 1, 0)
+        return value
+    return object_factory
+
+
+def compile_array_factory(schema, definitions, factories, list_size, max_depth):
+    """ Compiles the factory of a list or leaf-list.
+    The keys listed in 'x-key' are generated from the position of the entry, so that every
+    entry of a generated list is uniquely identified.
+    """
+    item = compile_payload_factory(schema['items'], definitions, factories, list_size, max_depth)
+    max_entries = list_size
+    keys = list()
+    if 'x-key' in schema:
+        properties = collect_payload_properties(schema['items'], definitions)
+        keys = [(key, properties[key]) for key in schema['x-key'] if key in properties]
+        # When every key is an enumeration, the number of entries is bounded by their combinations.
+        if keys and all('enum' in key_schema for key, key_schema in keys):
+            combinations = 1
+            for key, key_schema in keys:
+                combinations *= len(key_schema['enum'])
+            max_entries = min(max_entries, combinations)
+    # Enumeration keys are combined as the digits of a mixed radix number, so that their
+    # combinations do not repeat.
+    key_factories = list()
+    radix = 1
+    for key, key_schema in keys:
+        key_factories.append((key, compile_key_factory(key_schema, radix)))
+        if 'enum' in key_schema:
+            radix *= len(key_schema['enum'])
+
+    def array_factory(rng, depth, index):
+        entries = list()
+        for position in range(rng.randint(1, max_entries) if max_entries > 0 else 0):
+            entry = item(rng, depth, position)
+            for key, factory in key_factories:
+                entry[key] = factory(position)
+            entries.append(entry)
+        return entries
+    return array_factory
+
+
+def compile_key_factory(schema, radix=1):
+    """ Compiles a function mapping the position of a list entry to a unique key value.
+    Enumeration keys use the position divided by "radix", i.e. the combinations of the previous keys.
+    """
+    if 'enum' in schema:
+        enum = list(schema['enum'])
+        return lambda position: enum[(position // radix) % len(enum)]
+    if schema.get('type') == 'integer':
+        low, high = INTEGER_RANGES.get(schema.get('format'), (0, 2 ** 31 - 1))
+        return lambda position: low + position % (high - low + 1)
+    if schema.get('type') == 'number':
+        return lambda position: float(position)
+    if schema.get('type') == 'boolean':
+        return lambda position: bool(position % 2)
+    prefix = str(schema.get('example', 'key')).split()[0]
+    return lambda position: '{0}-{1}'.format(prefix, position)
+
+
+def compile_leaf_factory(schema):
+    """ Compiles the factory of a leaf, honoring its type, format, enum and default value."""
+    default = None
+    if 'default' in schema:
+        default = coerce_payload_value(schema, schema['default'])
+
+    if 'enum' in schema:
+        enum = list(schema['enum'])
+        generate = lambda rng: rng.choice(enum)
+    elif schema.get('type') == 'integer':
+        low, high = INTEGER_RANGES.get(schema.get('format'), (-2 ** 31, 2 ** 31 - 1))
+        generate = lambda rng: rng.randint(low, high)
+    elif schema.get('type') == 'number':
+        generate = lambda rng: rng.uniform(-1e6, 1e6)
+    elif schema.get('type') == 'boolean':
+        generate = lambda rng: rng.random() < 0.5
+    else:
+        generate = lambda rng: ''.join(rng.choice(_PAYLOAD_CHARS) for _ in range(rng.randint(4, 12)))
+
+    if default is None:
+        return lambda rng, depth, index: generate(rng)
+    # Leaves with a default value keep it in a quarter of the instances.
+    return lambda rng, depth, index: default if rng.random() < 0.25 else generate(rng)
+
+
+def coerce_payload_value(schema, value):
+    """ Converts a YANG default value, always stored as a string, to the json type of the schema."""
+    try:
+        if schema.get('type') == 'integer':
+            return int(value)
+        if schema.get('type') == 'number':
+            return float(value)
+        if schema.get('type') == 'boolean':
+            return str(value).lower() == 'true'
+    except ValueError:
+        return None
+    return value
+
+
+def resolve_payload_schema(schema, definitions):
+    """ Follows the '$ref' chain of a schema up to the referenced definition."""
+    while '$ref' in schema:
+        schema = definitions[schema['$ref'].split('/')[-1]]
+    return schema
+
+
+def collect_payload_properties(schema, definitions):
+    """ Returns the properties of an object schema, merging the ones of all its 'allOf' parts."""
+    schema = resolve_payload_schema(schema, definitions)
+    properties = dict(schema.get('properties', {}))
+    for part in schema.get('allOf', []):
+        properties.update(collect_payload_properties(part, definitions))
+    return properties
+
+
+def is_leaf_schema(schema):
+    """ Returns True if the schema describes a leaf, i.e. neither a container nor a list."""
+    return not ('$ref' in schema or 'allOf' in schema or 'properties' in schema or schema.get('type') == 'array')
+
+
+###########################################################
+############# Precompiled Body Validators #################
+###########################################################
+
+VALIDATORS_HEADER = '''"""Request body validators generated by the pyang swagger plugin from %(modules)s.
+
+Every definition of the swagger specification has a validate_<Definition>(value, path) function
+that raises ValidationError on the first error found. Run this module with a JSON-lines corpus to
+benchmark it against generic JSON-schema validation:
+
+    python %(file)s <definition> <corpus.jsonl> [spec.json]
+"""
+
+import json
+import sys
+import time
+
+try:
+    STRING_TYPES = (str, unicode)
+except NameError:
+    STRING_TYPES = (str,)
+INTEGER_TYPES = tuple(type(value) for value in (0, 2 ** 64))
+NUMBER_TYPES = INTEGER_TYPES + (float,)
+
+
+class ValidationError(ValueError):
+    """ Error raised when a request body does not match its schema."""
+
+    def __init__(self, path, message):
+        ValueError.__init__(self, '%%s: %%s' %% (path or '/', message))
+        self.path = path
+        self.message = message
+
+'''
+
+VALIDATORS_FOOTER = '''
+
+def benchmark(definition, corpus_file, spec_file=None):
+    """ Times the precompiled validator of a definition against generic JSON-schema validation."""
+    with open(corpus_file) as corpus:
+        bodies = [json.loads(line) for line in corpus if line.strip()]
+    validator = VALIDATORS[definition]
+    start = time.time()
+    for body in bodies:
+        validator(body, '')
+    results = {'bodies': len(bodies), 'precompiled': time.time() - start}
+
+    if spec_file:
+        import jsonschema
+        with open(spec_file) as spec:
+            definitions = json.load(spec)['definitions']
+        schema = {'$ref': '#/definitions/' + definition, 'definitions': definitions}
+        generic = jsonschema.Draft4Validator(schema)
+        start = time.time()
+        for body in bodies:
+            generic.validate(body)
+        results['generic'] = time.time() - start
+    return results
+
+
+if __name__ == '__main__':
+    print(json.dumps(benchmark(*sys.argv[1:4]), indent=4))
+'''
+
+
+def emit_validators(opts, modules, definitions):
+    """ Writes a python module with one precompiled validator function for each definition of the modules."""
+    state = {'constants': list(), 'counter': 0}
+    functions = list()
+    for name, schema in definitions.items():
+        lines = ['', '', 'def {0}(value, path):'.format(validator_name(name)),
+                 '    """ Validates a {0} object."""'.format(name)]
+        gen_validator_code(schema, 'value', 'path', lines, 1, state)
+        functions.extend(lines)
+
+    with open(opts.swagger_validators, 'w') as out:
+        out.write(VALIDATORS_HEADER % {'modules': ', '.join(str(module.arg) + '.yang' for module in modules),
+                                       'file': os.path.basename(opts.swagger_validators)})
+        for constant in state['constants']:
+            out.write(constant + '\n')
+        out.write('\n'.join(functions))
+        out.write('\n\n\nVALIDATORS = {\n')
+        for name in definitions:
+            out.write('    {0!r}: {1},\n'.format(str(name), validator_name(name)))
+        out.write('}\n')
+        out.write(VALIDATORS_FOOTER)
+
+
+def validator_name(definition):
+    """ Returns the name of the validator function of a definition."""
+    return 'validate_' + re.sub(r'\W', '_', str(definition))
+
+
+def gen_validator_code(schema, var, path, lines, level, state):
+    """ Appends to "lines" the inlined checks of a schema applied to the variable "var".
+    "path" is the python expression of the location of "var", only evaluated on errors.
+    """
+    indent = '    ' * level
+
+    def fail(message):
+        lines.append('{0}    raise ValidationError({1}, {2!r})'.format(indent, path, message))
+
+    if '$ref' in schema:
+        lines.append('{0}{1}({2}, {3})'.format(indent, validator_name(schema['$ref'].split('/')[-1]), var, path))
+        return
+
+    if 'allOf' in schema:
+        for part in schema['allOf']:
+            gen_validator_code(part, var, path, lines, level, state)
+        return
+
+    schema_type = schema.get('type')
+    if schema_type == 'array':
+        lines.append('{0}if not isinstance({1}, list):'.format(indent, var))
+        fail('expected an array')
+        state['counter'] += 1
+        index = 'i{0}'.format(state['counter'])
+        item = 'v{0}'.format(state['counter'])
+        seen = 'seen{0}'.format(state['counter'])
+        keys = schema.get('x-key')
+        if keys:
+            lines.append('{0}{1} = set()'.format(indent, seen))
+        lines.append('{0}for {1}, {2} in enumerate({3}):'.format(indent, index, item, var))
+        item_path = "{0} + '/' + str({1})".format(path, index)
+        gen_validator_code(schema['items'], item, item_path, lines, level + 1, state)
+        if keys:
+            key_value = '({0},)'.format(', '.join('{0}.get({1!r})'.format(item, str(key)) for key in keys))
+            lines.append('{0}    if {1} in {2}:'.format(indent, key_value, seen))
+            lines.append('{0}        raise ValidationError({1}, {2!r})'.format(
+                indent, item_path, 'duplicated key ' + ', '.join(keys)))
+            lines.append('{0}    {1}.add({2})'.format(indent, seen, key_value))
+        return
+
+    if 'properties' in schema:
+        lines.append('{0}if not isinstance({1}, dict):'.format(indent, var))
+        fail('expected an object')
+        for name, prop in schema['properties'].items():
+            state['counter'] += 1
+            prop_var = 'v{0}'.format(state['counter'])
+            lines.append('{0}{1} = {2}.get({3!r})'.format(indent, prop_var, var, str(name)))
+            lines.append('{0}if {1} is not None:'.format(indent, prop_var))
+            prop_path = '{0} + {1!r}'.format(path, '/' + str(name))
+            gen_validator_code(prop, prop_var, prop_path, lines, level + 1, state)
+        return
+
+    if schema_type == 'integer':
+        lines.append('{0}if type({1}) not in INTEGER_TYPES:'.format(indent, var))
+        fail('expected an integer')
+        if schema.get('format') in INTEGER_RANGES:
+            low, high = INTEGER_RANGES[schema['format']]
+            lines.append('{0}if not {1} <= {2} <= {3}:'.format(indent, low, var, high))
+            fail('out of the {0} range'.format(schema['format']))
+    elif schema_type == 'number':
+        lines.append('{0}if type({1}) not in NUMBER_TYPES:'.format(indent, var))
+        fail('expected a number')
+    elif schema_type == 'boolean':
+        lines.append('{0}if {1} is not True and {1} is not False:'.format(indent, var))
+        fail('expected a boolean')
+    elif schema_type == 'string':
+        lines.append('{0}if not isinstance({1}, STRING_TYPES):'.format(indent, var))
+        fail('expected a string')
+
+    if 'enum' in schema:
+        constant = 'ENUM_{0}'.format(len(state['constants']))
+        state['constants'].append('{0} = frozenset({1!r})'.format(
+            constant, sorted(str(value) for value in schema['enum'])))
+        lines.append('{0}if {1} not in {2}:'.format(indent, var, constant))
+        fail('expected one of ' + ', '.join(str(value) for value in schema['enum']))
+
+    if not lines[-1].startswith(indent) or lines[-1].endswith(':'):
+        lines.append('{0}pass'.format(indent))
+
+
+###########################################################
+#################### Specification Diff ###################
+###########################################################
+
+def emit_spec_diff(opts, model):
+    """ Writes the differences between a previously emitted specification and the current one,
+    either as a JSON Patch (RFC 6902) or as a summary of the changed paths, operations and definitions.
+    """
+    try:
+        with open(opts.swagger_diff_from) as previous_file:
+            previous = json.load(previous_file, object_pairs_hook=OrderedDict)
+    except (IOError, OSError, ValueError) as e:
+        raise error.EmitError('Cannot read the previous specification {0}: {1}'.format(opts.swagger_diff_from, e))
+    if not isinstance(previous, dict):
+        raise error.EmitError('The previous specification {0} is not a json object'.format(opts.swagger_diff_from))
+    # The round trip gives the current model the same types of the previous one.
+    current = json.loads(json.dumps(model), object_pairs_hook=OrderedDict)
+
+    if opts.swagger_diff_format == 'jsonpatch':
+        diff = list()
+        gen_json_patch(previous, current, '', diff)
+    else:
+        diff = gen_spec_changes(previous, current)
+
+    with open(opts.swagger_diff_output, 'w') as out:
+        out.write(json.dumps(diff, indent=4, separators=(',', ': ')))
+
+
+def gen_json_patch(previous, current, pointer, patch):
+    """ Appends to "patch" the JSON Patch operations turning "previous" into "current"."""
+    if isinstance(previous, dict) and isinstance(current, dict):
+        for key in previous:
+            if key not in current:
+                patch.append({'op': 'remove', 'path': pointer + '/' + escape_json_pointer(key)})
+        for key in current:
+            if key not in previous:
+                patch.append({'op': 'add', 'path': pointer + '/' + escape_json_pointer(key), 'value': current[key]})
+            else:
+                gen_json_patch(previous[key], current[key], pointer + '/' + escape_json_pointer(key), patch)
+    elif previous != current:
+        # Arrays are small in the specification (tags, enums, parameters), so they are replaced as a whole.
+        patch.append({'op': 'replace', 'path': pointer, 'value': current})
+
+
+def escape_json_pointer(key):
+    """ Escapes a key to be used in a JSON pointer (RFC 6901)."""
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+
+def gen_spec_changes(previous, current):
+    """ Summarizes the added, removed and changed paths, operations and definitions.
+    An operation is also changed when any definition it references, directly or not, has changed,
+    so that "changedOperationIds" lists everything a downstream generator has to rebuild.
+    """
+    changes = OrderedDict()
+    changes['paths'] = diff_keys(previous.get('paths', {}), current.get('paths', {}))
+    changes['definitions'] = diff_keys(spec_definitions(previous), spec_definitions(current))
+
+    previous_operations = index_operations(previous)
+    current_operations = index_operations(current)
+    changes['operations'] = diff_keys(previous_operations, current_operations)
+
+    changed_definitions = set(changes['definitions']['added'] + changes['definitions']['removed'] +
+                              changes['definitions']['changed'])
+    for operation_id in current_operations:
+        if operation_id in previous_operations and operation_id not in changes['operations']['changed']:
+            if referenced_definitions(current_operations[operation_id], spec_definitions(current)) & \
+                    changed_definitions:
+                changes['operations']['changed'].append(operation_id)
+
+    changes['changedOperationIds'] = sorted(changes['operations']['added'] + changes['operations']['changed'])
+    return changes
+
+
+def diff_keys(previous, current):
+    """ Compares two dictionaries, returning the added, removed and changed keys."""
+    diff = OrderedDict()
+    diff['added'] = [key for key in current if key not in previous]
+    diff['removed'] = [key for key in previous if key not in current]
+    diff['changed'] = [key for key in current if key in previous and current[key] != previous[key]]
+    return diff
+
+
+def index_operations(spec):
+    """ Returns the operations of the specification indexed by operationId."""
+    operations = OrderedDict()
+    for path in spec.get('paths', {}).values():
+        for operation in path.values():
+            if isinstance(operation, dict) and 'operationId' in operation:
+                operations[operation['operationId']] = operation
+    return operations
+
+
+def referenced_definitions(element, definitions, found=None):
+    """ Returns the names of the definitions referenced by an element, following nested references."""
+    if found is None:
+        found = set()
+    if isinstance(element, dict):
+        for key, value in element.items():
+            if key == '$ref' and str(value).startswith(('#/definitions/', '#/components/schemas/')):
+                name = value.split('/')[-1]
+                if name not in found:
+                    found.add(name)
+                    referenced_definitions(definitions.get(name, {}), definitions, found)
+            else:
+                referenced_definitions(value, definitions, found)
+    elif isinstance(element, list):
+        for value in element:
+            referenced_definitions(value, definitions, found)
+    return found
+
+
+def spec_definitions(spec):
+    """ Returns the schemas of a swagger 2.0 or an OpenAPI 3.0 specification."""
+    if 'definitions' in spec:
+        return spec['definitions']
+    return spec.get('components', {}).get('schemas', {})
+
+
+###########################################################
+################## Size Attribution Report ################
+###########################################################
+
+def emit_size_report(opts, modules, specs):
+    """ Writes a single report on the emitted specifications of all the modules, with their
+    total size and the breakdown of every one of them.
+    """
+    report = OrderedDict()
+    report['total'] = OrderedDict([('emitted', 0), ('compact', 0)])
+    report['modules'] = OrderedDict()
+    for module, spec in zip(modules, specs):
+        module_report = gen_size_report(opts, module, spec)
+        report['total']['emitted'] += module_report['total']['emitted']
+        report['total']['compact'] += module_report['total']['compact']
+        report['modules'][str(module.arg)] = module_report
+
+    with open(opts.swagger_size_report, 'w') as out:
+        out.write(json.dumps(report, indent=4, separators=(',', ': ')))
+
+
+def gen_size_report(opts, module, model):
+    """ Returns the report breaking the serialized size of the emitted specification, either swagger 2.0
+    or OpenAPI 3.0, down by root tag, path, definition and contributor type, together with the heaviest
+    subtrees of the YANG module.
+    All the sizes are bytes of compact json, so that they do not depend on the indentation.
+    """
+    report = OrderedDict()
+    report['total'] = OrderedDict()
+    report['total']['emitted'] = len(json.dumps(model, indent=4, separators=(',', ': ')))
+    report['total']['compact'] = json_size(model)
+
+    paths = model.get('paths', {})
+    definitions = spec_definitions(model)
+    path_sizes = OrderedDict((path, json_size(paths[path])) for path in paths)
+    definition_sizes = OrderedDict((name, json_size(definitions[name])) for name in definitions)
+
+    report['byTag'] = OrderedDict()
+    for path in paths:
+        tags = set(tag for operation in paths[path].values() for tag in operation.get('tags', ['default']))
+        for tag in tags:
+            report['byTag'][tag] = report['byTag'].get(tag, 0) + path_sizes[path] // len(tags)
+    report['byTag']['definitions'] = sum(definition_sizes.values())
+
+    report['byPath'] = sort_sizes(path_sizes)
+    report['byDefinition'] = sort_sizes(definition_sizes)
+
+    contributors = OrderedDict()
+    contributors['x-cliParam'] = sum_key_sizes(paths, 'x-cliParam')
+    contributors['parameters'] = sum_key_sizes(paths, 'parameters')
+    contributors['descriptions'] = sum_key_sizes(model, 'description')
+    # The *Schema definitions created by gen_api_node repeat a subtree already inlined in the
+    # definition of an ancestor node.
+    inlined = [json.dumps(definitions[name], separators=(',', ':')) for name in definitions]
+    contributors['duplicatedSchemas'] = sum(
+        definition_sizes[name] for index, name in enumerate(definitions) if name.endswith('Schema') and any(
+            other != index and inlined[index] in inlined[other] for other in range(len(inlined))))
+    report['byContributor'] = contributors
+
+    references = OrderedDict((path, referenced_definitions(paths[path], definitions)) for path in paths)
+    report['heaviestSubtrees'] = gen_subtree_sizes(module, references, path_sizes,
+                                                   definition_sizes)[:opts.swagger_size_report_top]
+    # The definitions which no path references, e.g. the ones of the previous modules of the run,
+    # are not part of any subtree.
+    referenced = set(name for names in references.values() for name in names)
+    report['unreferencedDefinitions'] = sum(size for name, size in definition_sizes.items() if name not in referenced)
+    return report
+
+
+def json_size(element):
+    """ Returns the size in bytes of the element serialized as compact json."""
+    return len(json.dumps(element, separators=(',', ':')))
+
+
+def sort_sizes(sizes):
+    """ Returns the sizes ordered from the heaviest."""
+    return OrderedDict(sorted(sizes.items(), key=lambda item: item[1], reverse=True))
+
+
+def sum_key_sizes(element, name):
+    """ Sums the sizes of all the "name" entries, key included, found in the element."""
+    total = 0
+    if isinstance(element, dict):
+        for key, value in element.items():
+            if key == name:
+                total += json_size({key: value}) - 2
+            else:
+                total += sum_key_sizes(value, name)
+    elif isinstance(element, list):
+        for value in element:
+            total += sum_key_sizes(value, name)
+    return total
+
+
+def gen_subtree_sizes(module, references, path_sizes, definition_sizes):
+    """ Attributes the size of every path to the schema node the path has been generated from and
+    to all its ancestors. "references" holds the definitions referenced by every path, directly or
+    not, and the size of a definition is split among all the paths referencing it, so that every
+    byte of the specification is counted once.
+    Returns the subtrees ordered from the heaviest, with their position in the YANG source.
+    """
+    referencing_paths = dict()
+    for names in references.values():
+        for name in names:
+            referencing_paths[name] = referencing_paths.get(name, 0) + 1
+
+    subtrees = OrderedDict()
+    for path, names in references.items():
+        size = path_sizes[path] + sum(float(definition_sizes.get(name, 0)) / referencing_paths[name]
+                                      for name in names)
+
+        nodes = [element for element in path.strip('/').split('/')
+                 if element and not (element[0] == '{' and element[-1] == '}')]
+        # Strip the prefixes which are not part of the schema tree.
+        if nodes[:2] == ['streams', 'sse']:
+            nodes = nodes[2:]
+        elif nodes[:1] in (['operations'], ['streams']):
+            nodes = nodes[1:]
+        for depth in range(1, len(nodes) + 1):
+            subtree = '/' + '/'.join(nodes[:depth])
+            subtrees[subtree] = subtrees.get(subtree, 0) + size
+
+    result = list()
+    for subtree, size in sorted(subtrees.items(), key=lambda item: item[1], reverse=True):
+        entry = OrderedDict()
+        entry['subtree'] = subtree
+        entry['size'] = int(round(size))
+        stmt = find_schema_node(module, subtree.strip('/').split('/'))
+        if stmt is not None:
+            entry['keyword'] = stmt.keyword
+            entry['source'] = str(stmt.pos)
+        result.append(entry)
+    return result
+
+
+def find_schema_node(module, names):
+    """ Returns the schema node of the module reached following the names, or None."""
+    stmt = module
+    for name in names:
+        children = [child for child in getattr(stmt, 'i_children', []) if child.arg == name]
+        if not children:
+            return None
+        stmt = children[0]
+    return stmt
+
+
+###########################################################
+################### Generation Service ####################
+###########################################################
+
+# Context shared by the generation workers, which inherit it already loaded when forked.
+_SERVE_CTX = None
+# Options producing side files, which are disabled in the generation service.
+SERVE_DISABLED_OPTIONS = ['swagger_payload_dir', 'swagger_validators', 'swagger_diff_from', 'swagger_size_report',
+                          'swagger_ir']
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """ HTTP server handling every connection in its own thread."""
+    daemon_threads = True
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    """ HTTP server listening on a local Unix socket."""
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        UnixStreamServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+class SwaggerRequestHandler(BaseHTTPRequestHandler):
+    """ Handles the requests of the generation service.
+    POST /swagger takes a YANG module as body and returns its swagger specification,
+    GET /metrics returns the latency and cache metrics of the service.
+    """
+
+    def do_POST(self):
+        if self.path.split('?')[0] != '/swagger':
+            return self.send_json(404, {'error': 'Unknown resource ' + self.path})
+        if self.headers.get('Content-Length') is None:
+            return self.send_json(411, {'errors': ['Content-Length is required']})
+        try:
+            length = int(self.headers.get('Content-Length'))
+            if length < 0:
+                raise ValueError('Negative Content-Length')
+            text = self.rfile.read(length).decode('utf-8')
+        except (ValueError, UnicodeDecodeError) as e:
+            return self.send_json(400, {'errors': [str(e)]})
+        status, body = self.server.generate(text)
+        self.send_json(status, body)
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            return self.send_json(404, {'error': 'Unknown resource ' + self.path})
+        self.send_json(200, self.server.get_metrics())
+
+    def send_json(self, status, body):
+        data = (body if isinstance(body, str) else json.dumps(body, indent=4, separators=(',', ': ')))
+        data = data.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        # Clients of a Unix socket have no address.
+        return self.client_address[0] if self.client_address else 'local'
+
+
+def serve_swagger(ctx, modules):
+    """ Runs the generation service until interrupted.
+    The modules of the search path which do not modify other modules are parsed and validated
+    once in a shared context, then a pool of worker processes, forked with the loaded context,
+    generates the specifications of the requested modules.
+    """
+    global _SERVE_CTX
+    started = time.time()
+    # The modules given on the command line and the augmenting ones would change the shared modules,
+    # so the context is loaded again from scratch.
+    shared_ctx = new_context(ctx)
+    for name in find_import_only_modules(shared_ctx):
+        shared_ctx.search_module(error.Position('swagger-serve'), name)
+    del shared_ctx.errors[:]
+    for option in SERVE_DISABLED_OPTIONS:
+        setattr(shared_ctx.opts, option, None)
+    _SERVE_CTX = shared_ctx
+
+    if ctx.opts.swagger_serve.startswith('unix:'):
+        server = ThreadingUnixHTTPServer(ctx.opts.swagger_serve[len('unix:'):], SwaggerRequestHandler)
+    else:
+        host, port = ctx.opts.swagger_serve.rsplit(':', 1)
+        server = ThreadingHTTPServer((host, int(port)), SwaggerRequestHandler)
+
+    # Every worker serves a single request, since the requested module may augment the shared modules
+    # or load new ones, and is replaced by a new fork of the unchanged context.
+    try:
+        pool_context = multiprocessing.get_context('fork')
+    except AttributeError:
+        # Python 2 always forks the workers.
+        pool_context = multiprocessing
+    pool = pool_context.Pool(ctx.opts.swagger_serve_workers, maxtasksperchild=1)
+    lock = threading.Lock()
+    latencies = deque(maxlen=1024)
+    results = OrderedDict()
+    metrics = {'requests': 0, 'errors': 0, 'inFlight': 0, 'cacheHits': 0, 'cacheMisses': 0}
+
+    def generate(text):
+        start = time.time()
+        key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        with lock:
+            metrics['requests'] += 1
+            metrics['inFlight'] += 1
+            cached = results.get(key)
+            if cached:
+                metrics['cacheHits'] += 1
+                results[key] = results.pop(key)
+            else:
+                metrics['cacheMisses'] += 1
+        try:
+            if not cached:
+                cached = run_worker(pool, text, ctx.opts.swagger_serve_timeout)
+            with lock:
+                if cached[0] == 200:
+                    results[key] = cached
+                    while len(results) > ctx.opts.swagger_serve_cache_size:
+                        results.popitem(last=False)
+                else:
+                    metrics['errors'] += 1
+            return cached
+        finally:
+            with lock:
+                metrics['inFlight'] -= 1
+                latencies.append(time.time() - start)
+
+    def get_metrics():
+        with lock:
+            report = OrderedDict()
+            report['uptime'] = time.time() - started
+            report.update(sorted(metrics.items()))
+            report['cachedSpecs'] = len(results)
+            report['sharedModules'] = len(shared_ctx.modules)
+            samples = sorted(latencies)
+        if samples:
+            report['latency'] = OrderedDict()
+            report['latency']['mean'] = sum(samples) / len(samples)
+            for percentile in (50, 95, 99):
+                report['latency']['p{0}'.format(percentile)] = samples[(len(samples) - 1) * percentile // 100]
+            report['latency']['max'] = samples[-1]
+        return report
+
+    server.generate = generate
+    server.get_metrics = get_metrics
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.terminate()
+
+
+def run_worker(pool, text, timeout):
+    """ Generates the specification of a module in a worker of the pool.
+    Returns the HTTP status and the body of the response, which is an error if the worker
+    has failed or has not answered in time, e.g. because it has died.
+    """
+    try:
+        return pool.apply_async(serve_generate, (text,)).get(timeout)
+    except multiprocessing.TimeoutError:
+        return 503, {'errors': ['No answer of the generation worker after {0} seconds'.format(timeout)]}
+    except Exception as e:
+        return 500, {'errors': [str(e)]}
+
+
+def serve_generate(text):
+    """ Generates the specification of a module in a worker of the generation service.
+    Returns the HTTP status and the body of the response.
+    """
+    ctx = _SERVE_CTX
+    if not text.strip():
+        return 400, {'errors': ['Empty module']}
+    try:
+        if util.guess_format(text) == 'yin':
+            module = yin_parser.YinParser().parse(ctx, '<request>', text)
+        else:
+            module = yang_parser.YangParser().parse(ctx, '<request>', text)
+        if module is None:
+            return 400, {'errors': [error_message(e) for e in ctx.errors] or ['Invalid module']}
+
+        # A module of the search path with the same name is shadowed by the requested one.
+        ctx.modules.pop((module.arg, util.get_latest_revision(module)), None)
+        ctx.add_parsed_module(module)
+        errors = [error_message(e) for e in ctx.errors if not error.is_warning(error.err_level(e[1]))]
+        if errors:
+            return 400, {'errors': errors}
+
+        # The plugin keeps its state in globals, which are reset as for a new pyang run.
+        TYPEDEFS.clear()
+        PARENT_MODELS.clear()
+        del pending_models[:]
+        add_fake_list_at_beginning(module)
+        fd = StringIO()
+        emit_swagger_spec(ctx, [module], fd, ctx.opts.path)
+        return 200, fd.getvalue()
+    except Exception as e:
+        return 400, {'errors': [str(e)]}
+
+
+def find_import_only_modules(ctx):
+    """ Returns the names of the modules of the search path which can be shared by all the requests
+    of the generation service, i.e. the ones which neither augment nor deviate other modules,
+    themselves, through their submodules or through the modules they import.
+    """
+    dependencies = dict()
+    modifying = set()
+    for name, revs in ctx.revs.items():
+        dependencies[name] = set()
+        for rev, handle in revs:
+            try:
+                ref, in_format, text = ctx.repository.get_module_from_handle(handle)
+            except ctx.repository.ReadError:
+                modifying.add(name)
+                continue
+            if in_format == 'yin':
+                module = yin_parser.YinParser().parse(ctx, ref, text)
+            else:
+                module = yang_parser.YangParser().parse(ctx, ref, text)
+            if module is None:
+                modifying.add(name)
+                continue
+            for stmt in module.substmts:
+                if stmt.keyword in ('augment', 'deviation'):
+                    modifying.add(name)
+                elif stmt.keyword in ('import', 'include'):
+                    dependencies[name].add(stmt.arg)
+    del ctx.errors[:]
+
+    # The modifying modules are propagated to the modules depending on them.
+    changed = True
+    while changed:
+        changed = False
+        for name, names in dependencies.items():
+            if name not in modifying and not names.isdisjoint(modifying):
+                modifying.add(name)
+                changed = True
+    return sorted(name for name in dependencies if name not in modifying)
+
+
+def error_message(err):
+    """ Formats a pyang error as a string."""
+    (pos, tag, args) = err
+    return '{0}: {1}'.format(pos, error.err_to_str(tag, args))
+
+
+###########################################################
+############### Module Repository Snapshot ################
+###########################################################
+
+# Version of the snapshot format, bumped whenever its content changes.
+SNAPSHOT_VERSION = 2
+
+
+def load_snapshot(ctx):
+    """ Adds to the context the parsed and validated modules of a snapshot.
+    The snapshot is ignored if any file of the search path has been added, removed or modified,
+    or if it has been written by another version of pyang or of the plugin.
+    Returns the keys of the loaded modules, or None if the snapshot is missing or invalid.
+    """
+    try:
+        with open(ctx.opts.swagger_snapshot, 'rb') as snapshot_file:
+            snapshot = pickle.loads(zlib.decompress(snapshot_file.read()))
+    except (IOError, OSError, ValueError, EOFError, zlib.error, pickle.UnpicklingError):
+        return None
+
+    if (snapshot.get('version') != SNAPSHOT_VERSION or snapshot['tool'] != snapshot_tool_version() or
+            snapshot['files'] != hash_repository_files(ctx)):
+        return None
+
+    ctx.modules.update(snapshot['modules'])
+    # The known revisions avoid parsing the files again only to find out their revision.
+    for name, revs in snapshot['revs'].items():
+        if name in ctx.revs:
+            ctx.revs[name] = revs
+    return set(snapshot['modules'])
+
+
+def save_snapshot(ctx, modules):
+    """ Writes the snapshot of the modules of the search path loaded in the context, i.e. all
+    the validated modules except the ones given on the command line.
+    The modules are loaded again in a new context, since the modules given on the command line
+    may have augmented the ones of the context.
+    """
+    snapshot_ctx = new_context(ctx)
+    for (name, rev), module in list(ctx.modules.items()):
+        if module is not None and module not in modules:
+            snapshot_ctx.search_module(error.Position('swagger-snapshot'), name, rev)
+
+    shared = dict((key, module) for key, module in snapshot_ctx.modules.items() if module is not None)
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'tool': snapshot_tool_version(),
+        'files': hash_repository_files(ctx),
+        'modules': shared,
+        'revs': dict((key[0], snapshot_ctx.revs[key[0]]) for key in shared if key[0] in snapshot_ctx.revs)
+    }
+    # The statements are deeply nested and linked to their parents.
+    recursion_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(recursion_limit, 100000))
+    try:
+        data = zlib.compress(pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL))
+    finally:
+        sys.setrecursionlimit(recursion_limit)
+    with open(ctx.opts.swagger_snapshot, 'wb') as snapshot_file:
+        snapshot_file.write(data)
+
+
+def new_context(ctx):
+    """ Returns an empty context with the search path and the settings of the given one."""
+    empty_ctx = Context(ctx.repository)
+    for attribute in ('opts', 'features', 'strict', 'canonical', 'max_line_len', 'max_identifier_len',
+                      'implicit_errors', 'lax_xpath_checks', 'keep_comments'):
+        setattr(empty_ctx, attribute, getattr(ctx, attribute))
+    return empty_ctx
+
+
+def snapshot_tool_version():
+    """ Returns the version of pyang and the sha256 digest of the plugin source, since the pickled
+    statements depend on both of them.
+    """
+    source = os.path.splitext(__file__)[0] + '.py'
+    if not os.path.exists(source):
+        source = __file__
+    with open(source, 'rb') as source_file:
+        return getattr(pyang, '__version__', None), hashlib.sha256(source_file.read()).hexdigest()
+
+
+def hash_repository_files(ctx):
+    """ Returns the sha256 digest of every module file of the search path."""
+    digests = dict()
+    for name, rev, handle in ctx.repository.get_modules_and_revisions(ctx):
+        with open(handle[1], 'rb') as module_file:
+            digests[handle[1]] = hashlib.sha256(module_file.read()).hexdigest()
+    return digests
+
+
+###########################################################
+############# API Intermediate Representation #############
+###########################################################
+
+# Version of the intermediate representation, bumped whenever its content changes.
+IR_VERSION = 1
+# Options changing the generated API, which are part of the key of the IR cache.
+IR_OPTIONS = ['s_api', 'swagger_pagination', 'swagger_yang_patch', 'swagger_conditional', 'swagger_cbor',
+              'swagger_sse']
+
+
+def build_api_ir(module, model):
+    """ Builds the format-neutral intermediate representation of the API from the swagger model.
+    The IR is made of plain dictionaries and lists only, so it can be stored as json, and
+    references its schemas as '#/schemas/<name>'. It is laid out as follows:
+
+        module, info, server, tags: the description of the API and where it is served
+        resources: list of {path, operations}, where every operation holds its method, ids,
+                   media types, parameters (located in path, query, header or body),
+                   responses and the CLI metadata
+        schemas: the data models, as json schemas
+    """
+    ir = OrderedDict()
+    ir['irVersion'] = IR_VERSION
+    ir['module'] = str(module.arg)
+    ir['info'] = copy_ir(model['info'])
+    ir['server'] = OrderedDict([('host', model['host']), ('basePath', model['basePath']),
+                                ('schemes', list(model['schemes']))])
+    if 'tags' in model:
+        ir['tags'] = copy_ir(model['tags'])
+
+    if 'paths' in model:
+        ir['resources'] = list()
+        for path, operations in model['paths'].items():
+            resource = OrderedDict([('path', path), ('operations', list())])
+            for method, operation in operations.items():
+                resource['operations'].append(build_operation_ir(method, operation))
+            ir['resources'].append(resource)
+
+    ir['schemas'] = copy_ir(model['definitions'])
+    return ir
+
+
+def build_operation_ir(method, operation):
+    """ Builds the intermediate representation of a swagger operation."""
+    op = OrderedDict()
+    op['method'] = method
+    for key in ('operationId', 'summary', 'description', 'tags', 'produces', 'consumes', 'schemes'):
+        if key in operation:
+            op[key] = copy_ir(operation[key])
+
+    if 'parameters' in operation:
+        op['parameters'] = list()
+        for parameter in operation['parameters']:
+            param = OrderedDict()
+            param['name'] = parameter['name']
+            param['location'] = parameter['in']
+            for key in ('description', 'required'):
+                if key in parameter:
+                    param[key] = parameter[key]
+            if parameter['in'] == 'body':
+                param['schema'] = copy_ir(parameter['schema'])
+            else:
+                param['schema'] = OrderedDict((key, copy_ir(value)) for key, value in parameter.items()
+                                              if key not in ('in', 'name', 'description', 'required'))
+            op['parameters'].append(param)
+
+    op['responses'] = list()
+    for status, response in operation['responses'].items():
+        resp = OrderedDict([('status', status)])
+        resp.update(copy_ir(response))
+        op['responses'].append(resp)
+
+    if 'x-cliParam' in operation:
+        op['cli'] = copy_ir(operation['x-cliParam'])
+    return op
+
+
+def copy_ir(element, prefix='#/definitions/', new_prefix='#/schemas/'):
+    """ Deep copies an element, replacing the prefix of the schema references."""
+    if isinstance(element, dict):
+        copy = OrderedDict()
+        for key, value in element.items():
+            if key == '$ref' and str(value).startswith(prefix):
+                copy[key] = new_prefix + value[len(prefix):]
+            else:
+                copy[key] = copy_ir(value, prefix, new_prefix)
+        return copy
+    elif isinstance(element, list):
+        return [copy_ir(value, prefix, new_prefix) for value in element]
+    return element
+
+
+def load_ir_cache(ctx):
+    """ Returns the cached intermediate representations of the modules, or None if the cache is
+    missing or has been generated from other modules or options.
+    """
+    try:
+        with open(ctx.opts.swagger_ir) as cache_file:
+            cache = json.load(cache_file, object_pairs_hook=OrderedDict)
+    except (IOError, OSError, ValueError):
+        return None
+    if cache.get('key') != ir_cache_key(ctx):
+        return None
+    return cache['irs']
+
+
+def save_ir_cache(ctx, irs):
+    """ Writes the intermediate representations of the modules to the cache."""
+    cache = OrderedDict([('key', ir_cache_key(ctx)), ('irs', irs)])
+    with open(ctx.opts.swagger_ir, 'w') as cache_file:
+        cache_file.write(json.dumps(cache, separators=(',', ':')))
+
+
+def ir_cache_key(ctx):
+    """ Returns the digest of the sources of all the loaded modules, of the options and of the
+    versions of pyang and of the plugin generating the IR.
+    """
+    digest = hashlib.sha256()
+    digest.update(str(IR_VERSION).encode('utf-8'))
+    digest.update(repr(snapshot_tool_version()).encode('utf-8'))
+    for option in IR_OPTIONS:
+        digest.update(repr(getattr(ctx.opts, option, None)).encode('utf-8'))
+    for key in sorted(key for key in ctx.modules if ctx.modules[key] is not None):
+        ref = ctx.modules[key].pos.ref
+        digest.update(repr(key).encode('utf-8'))
+        if os.path.isfile(ref):
+            with open(ref, 'rb') as source:
+                digest.update(source.read())
+    return digest.hexdigest()
+
+
+def render_swagger2(ir):
+    """ Renders the intermediate representation as a swagger 2.0 specification."""
+    model = OrderedDict()
+    model['swagger'] = '2.0'
+    model['info'] = copy_ir(ir['info'])
+    model['host'] = ir['server']['host']
+    model['basePath'] = ir['server']['basePath']
+    model['schemes'] = list(ir['server']['schemes'])
+    if 'tags' in ir:
+        model['tags'] = copy_ir(ir['tags'])
+
+    if 'resources' in ir:
+        model['paths'] = OrderedDict()
+        for resource in ir['resources']:
+            operations = OrderedDict()
+            for op in resource['operations']:
+                operations[op['method']] = render_swagger2_operation(op)
+            model['paths'][resource['path']] = operations
+
+    model['definitions'] = copy_ir(ir['schemas'], '#/schemas/', '#/definitions/')
+    return model
+
+
+def render_swagger2_operation(op):
+    """ Renders an operation of the intermediate representation as a swagger 2.0 operation."""
+    operation = OrderedDict()
+    for key in ('summary', 'description', 'operationId', 'produces', 'consumes'):
+        if key in op:
+            operation[key] = copy_ir(op[key])
+    if 'cli' in op:
+        operation['x-cliParam'] = copy_ir(op['cli'])
+    if 'tags' in op:
+        operation['tags'] = list(op['tags'])
+
+    if 'parameters' in op:
+        operation['parameters'] = list()
+        for param in op['parameters']:
+            parameter = OrderedDict([('in', param['location']), ('name', param['name'])])
+            if param['location'] == 'body':
+                parameter['schema'] = copy_ir(param['schema'], '#/schemas/', '#/definitions/')
+            for key in ('description', 'required'):
+                if key in param:
+                    parameter[key] = param[key]
+            if param['location'] != 'body':
+                parameter.update(copy_ir(param['schema'], '#/schemas/', '#/definitions/'))
+            operation['parameters'].append(parameter)
+
+    operation['responses'] = OrderedDict()
+    for resp in op['responses']:
+        operation['responses'][resp['status']] = OrderedDict(
+            (key, value) for key, value in copy_ir(resp, '#/schemas/', '#/definitions/').items() if key != 'status')
+
+    if 'schemes' in op:
+        operation['schemes'] = list(op['schemes'])
+    return operation
+
+
+def render_openapi3(ir):
+    """ Renders the intermediate representation as an OpenAPI 3.0 specification."""
+    spec = OrderedDict()
+    spec['openapi'] = '3.0.0'
+    spec['info'] = copy_ir(ir['info'])
+    spec['servers'] = [{'url': '{0}://{1}{2}'.format(scheme, ir['server']['host'], ir['server']['basePath'])}
+                       for scheme in ir['server']['schemes']]
+    if 'tags' in ir:
+        spec['tags'] = copy_ir(ir['tags'])
+
+    if 'resources' in ir:
+        spec['paths'] = OrderedDict()
+        for resource in ir['resources']:
+            operations = OrderedDict()
+            for op in resource['operations']:
+                operations[op['method']] = render_openapi3_operation(op, ir['server'])
+            spec['paths'][resource['path']] = operations
+
+    schemas = copy_ir(ir['schemas'], '#/schemas/', '#/components/schemas/')
+    for schema in schemas.values():
+        # The discriminator is an object in OpenAPI 3.
+        if 'discriminator' in schema:
+            schema['discriminator'] = {'propertyName': schema['discriminator']}
+    spec['components'] = {'schemas': schemas}
+    return spec
+
+
+def render_openapi3_operation(op, server):
+    """ Renders an operation of the intermediate representation as an OpenAPI 3.0 operation."""
+    operation = OrderedDict()
+    for key in ('summary', 'description', 'operationId', 'tags'):
+        if key in op:
+            operation[key] = copy_ir(op[key])
+
+    parameters = list()
+    for param in op.get('parameters', []):
+        schema = copy_ir(param['schema'], '#/schemas/', '#/components/schemas/')
+        if param['location'] == 'body':
+            operation['requestBody'] = OrderedDict()
+            operation['requestBody']['description'] = param.get('description', '')
+            operation['requestBody']['content'] = OrderedDict(
+                (media_type, {'schema': schema}) for media_type in op.get('consumes', ['application/json']))
+        else:
+            parameter = OrderedDict([('name', param['name']), ('in', param['location'])])
+            for key in ('description', 'required'):
+                if key in param:
+                    parameter[key] = param[key]
+            # Path parameters are always required in OpenAPI 3.
+            if param['location'] == 'path':
+                parameter['required'] = True
+            parameter['schema'] = schema
+            parameters.append(parameter)
+    if parameters:
+        operation['parameters'] = parameters
+
+    operation['responses'] = OrderedDict()
+    for resp in op['responses']:
+        response = OrderedDict([('description', resp['description'])])
+        if 'headers' in resp:
+            response['headers'] = OrderedDict(
+                (name, OrderedDict([('description', header.get('description', '')),
+                                    ('schema', {'type': header['type']})]))
+                for name, header in resp['headers'].items())
+        if 'schema' in resp:
+            schema = copy_ir(resp['schema'], '#/schemas/', '#/components/schemas/')
+            response['content'] = OrderedDict(
+                (media_type, {'schema': schema}) for media_type in op.get('produces', ['application/json']))
+        operation['responses'][resp['status']] = response
+
+    # The operations served over other schemes, e.g. websockets, have their own servers.
+    if 'schemes' in op:
+        operation['servers'] = [{'url': '{0}://{1}{2}'.format(scheme, server['host'], server['basePath'])}
+                                for scheme in op['schemes']]
+    if 'cli' in op:
+        operation['x-cliParam'] = copy_ir(op['cli'])
+    return operation
+
+
+def render_cli_index(ir):
+    """ Renders the intermediate representation as the index of the commands of the CLI,
+    i.e. the CLI metadata of every operation together with the request it maps to.
+    """
+    index = OrderedDict()
+    index['module'] = ir['module']
+    index['commands'] = list()
+    for resource in ir.get('resources', []):
+        for op in resource['operations']:
+            if 'cli' not in op:
+                continue
+            command = OrderedDict()
+            command['commandName'] = op['cli']['commandName']
+            command['parentCommand'] = op['cli'].get('parentCommand')
+            command['commandUse'] = op['cli'].get('commandUse')
+            command['summary'] = op['cli'].get('summary')
+            command['operationId'] = op['operationId']
+            command['method'] = op['method']
+            command['path'] = resource['path']
+            for key, value in op['cli'].items():
+                if key not in command:
+                    command[key] = copy_ir(value)
+            index['commands'].append(command)
+    return index
+
+
+# The renderers of the intermediate representation, by output format.
+RENDERERS = OrderedDict([
+    ('swagger2', render_swagger2),
+    ('openapi3', render_openapi3),
+    ('cli-index', render_cli_index)
+])
+
+
+# The formats describing the API with its paths and schemas.
+SPEC_FORMATS = ['swagger2', 'openapi3']
+
+
+def register_renderer(name, renderer):
+    """ Registers a renderer, i.e. a function returning the json output of the format from the
+    intermediate representation of a module. It must be called before the options are parsed.
+    """
+    RENDERERS[name] = renderer
+
+
 def to_lower_camelcase(name):
     """ Converts the name string to lower camelcase by using "-" and "_" as
     markers.